@@ -1,16 +1,24 @@
 import argparse
+import copy
+import fnmatch
+import functools
 import glob
-import json
 import os
+import re
+import stat
 from dataclasses import dataclass, field, fields
 from enum import Enum, StrEnum
 from pathlib import Path
-from typing import Any, Optional, Sequence, Union
-
-import shtab
+from typing import Any, Callable, Iterator, Optional, Sequence, Union
 
 from vectorcode import __version__
 
+try:
+    # orjson is pulled in by chromadb, but don't make it a hard requirement.
+    from orjson import loads as _json_loads
+except ModuleNotFoundError:  # pragma: nocover
+    from json import loads as _json_loads
+
 PathLike = Union[str, Path]
 
 GLOBAL_CONFIG_PATH = os.path.join(
@@ -19,18 +27,40 @@ GLOBAL_CONFIG_PATH = os.path.join(
 
 CHECK_OPTIONS = ["config"]
 
+# The keys of a JSON config file and their default values. This is the single
+# list of keys read by `Config.import_from` and kept by `load_config_file`.
+CONFIG_FILE_DEFAULTS: dict[str, Any] = {
+    "embedding_function": "SentenceTransformerEmbeddingFunction",
+    "embedding_params": {},
+    "host": "localhost",
+    "port": 8000,
+    "db_path": None,
+    "chunk_size": -1,
+    "overlap_ratio": 0.2,
+    "query_multiplier": -1,
+    "reranker": None,
+    "reranker_params": {},
+    "db_settings": None,
+    "concurrency": 0,
+}
+
 
 class QueryInclude(StrEnum):
     path = "path"
     document = "document"
 
+    def __init__(self, value: str):
+        # the headers are constant, so build them once when the members are created.
+        if value == "document":
+            self._header = f"{value.capitalize()}:\n"
+        else:
+            self._header = f"{value.capitalize()}: "
+
     def to_header(self) -> str:
         """
         Make the string into a nice-looking format for printing in the terminal.
         """
-        if self.value == "document":
-            return f"{self.value.capitalize()}:\n"
-        return f"{self.value.capitalize()}: "
+        return self._header
 
 
 class CliAction(Enum):
@@ -45,7 +75,7 @@ class CliAction(Enum):
     clean = "clean"
 
 
-@dataclass
+@dataclass(slots=True)
 class Config:
     no_stderr: bool = False
     recursive: bool = False
@@ -74,92 +104,146 @@ class Config:
     include: list[QueryInclude] = field(
         default_factory=lambda: [QueryInclude.path, QueryInclude.document]
     )
+    concurrency: int = 0
 
     @classmethod
-    async def import_from(cls, config_dict: dict[str, Any]) -> "Config":
+    def import_from(cls, config_dict: dict[str, Any]) -> "Config":
         """
         Raise IOError if db_path is not valid.
         """
-        db_path = config_dict.get("db_path")
-        host = config_dict.get("host") or "localhost"
-        port = config_dict.get("port") or 8000
+        values = {
+            key: config_dict[key] if key in config_dict else copy.copy(default)
+            for key, default in CONFIG_FILE_DEFAULTS.items()
+        }
+        values["host"] = values["host"] or CONFIG_FILE_DEFAULTS["host"]
+        values["port"] = values["port"] or CONFIG_FILE_DEFAULTS["port"]
+        db_path = values["db_path"]
         if db_path is None:
-            db_path = os.path.expanduser("~/.local/share/vectorcode/chromadb/")
+            values["db_path"] = os.path.expanduser(
+                "~/.local/share/vectorcode/chromadb/"
+            )
         elif not os.path.isdir(db_path):
             raise IOError(
                 f"The configured db_path ({str(db_path)}) is not a valid directory."
             )
-        return Config(
-            **{
-                "embedding_function": config_dict.get(
-                    "embedding_function", "SentenceTransformerEmbeddingFunction"
-                ),
-                "embedding_params": config_dict.get("embedding_params", {}),
-                "host": host,
-                "port": port,
-                "db_path": db_path,
-                "chunk_size": config_dict.get("chunk_size", -1),
-                "overlap_ratio": config_dict.get("overlap_ratio", 0.2),
-                "query_multiplier": config_dict.get("query_multiplier", -1),
-                "reranker": config_dict.get("reranker", None),
-                "reranker_params": config_dict.get("reranker_params", {}),
-                "db_settings": config_dict.get("db_settings", None),
-            }
-        )
+        return Config(**values)
 
-    async def merge_from(self, other: "Config") -> "Config":
+    def merge_from(self, other: "Config") -> "Config":
         """Return the merged config."""
         final_config = {}
-        default_config = Config()
-        for merged_field in fields(self):
-            final_config[merged_field.name] = getattr(other, merged_field.name)
-            if not final_config[merged_field.name] or final_config[
-                merged_field.name
-            ] == getattr(default_config, merged_field.name):
-                final_config[merged_field.name] = getattr(self, merged_field.name)
+        for name, default in _FIELD_DEFAULTS:
+            value = getattr(other, name)
+            if not value or value == default:
+                value = getattr(self, name)
+            final_config[name] = value
         return Config(**final_config)
 
 
-def get_cli_parser():
-    shared_parser = argparse.ArgumentParser(add_help=False)
-    chunkinng_parser = argparse.ArgumentParser(add_help=False)
-    chunkinng_parser.add_argument(
-        "--overlap", "-o", type=float, help="Ratio of overlaps between chunks."
-    )
-    chunkinng_parser.add_argument(
-        "-c",
-        "--chunk_size",
-        type=int,
-        default=-1,
-        help="Size of chunks (-1 for no chunking).",
-    )
-    shared_parser.add_argument(
+# (name, default value) of every field in `Config`, used by `Config.merge_from`.
+_DEFAULT_CONFIG = Config()
+_FIELD_DEFAULTS = tuple(
+    (config_field.name, getattr(_DEFAULT_CONFIG, config_field.name))
+    for config_field in fields(Config)
+)
+
+
+_QUERY_INCLUDE_VALUES = tuple(i.value for i in QueryInclude)
+
+
+# placeholders for the shtab completion hints, resolved by `_PrintCompletionAction`.
+_DIRECTORY_COMPLETION = "directory"
+_FILE_COMPLETION = "file"
+_COMPLETION_SHELLS = ("bash", "zsh", "tcsh", "fish", "powershell")
+
+
+def _resolve_completion_hints(parser: argparse.ArgumentParser, shtab) -> None:
+    """Replace the completion placeholders in the parser tree by shtab's hints."""
+    hints = {_DIRECTORY_COMPLETION: shtab.DIRECTORY, _FILE_COMPLETION: shtab.FILE}
+    stack = [parser]
+    while stack:
+        curr = stack.pop()
+        for action in curr._actions:
+            hint = getattr(action, "complete", None)
+            if isinstance(hint, str) and hint in hints:
+                action.complete = hints[hint]
+            if isinstance(action, argparse._SubParsersAction):
+                stack.extend(action.choices.values())
+
+
+class _PrintCompletionAction(argparse.Action):
+    """
+    Print the completion script. shtab is only imported when the script is
+    requested, so that other subcommands don't pay for the import.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import shtab
+
+        if values not in shtab.SUPPORTED_SHELLS:
+            parser.error(f"The installed shtab doesn't support {values}.")
+        _resolve_completion_hints(parser, shtab)
+        print(shtab.complete(parser, values))
+        parser.exit(0)
+
+
+def _add_shared_args(parser: argparse.ArgumentParser):
+    """Add the options that are accepted by all subcommands."""
+    parser.add_argument(
         "--project_root",
         default=None,
         help="Project root to be used as an identifier of the project.",
-    ).complete = shtab.DIRECTORY
-    shared_parser.add_argument(
+    ).complete = _DIRECTORY_COMPLETION
+    parser.add_argument(
         "--pipe",
         "-p",
         action="store_true",
         default=False,
         help="Print structured output for other programs to process.",
     )
-    shared_parser.add_argument(
+    parser.add_argument(
         "--no_stderr",
         action="store_true",
         default=False,
         help="Supress all STDERR messages.",
     )
+
+
+def _add_chunking_args(parser: argparse.ArgumentParser):
+    """Add the options that control how documents are chunked."""
+    parser.add_argument(
+        "--overlap", "-o", type=float, help="Ratio of overlaps between chunks."
+    )
+    parser.add_argument(
+        "-c",
+        "--chunk_size",
+        type=int,
+        default=-1,
+        help="Size of chunks (-1 for no chunking).",
+    )
+
+
+@functools.cache
+def get_cli_parser():
+    def add_subparser(name: str, chunking: bool = False, **kwargs):
+        # Adding the shared options directly is cheaper than `parents=[...]`,
+        # which copies every action of the parent parsers into each subparser.
+        subparser = subparsers.add_parser(name, **kwargs)
+        _add_shared_args(subparser)
+        if chunking:
+            _add_chunking_args(subparser)
+        return subparser
+
     main_parser = argparse.ArgumentParser(
         "vectorcode",
-        parents=[shared_parser],
         description=f"VectorCode {__version__}: A CLI RAG utility.",
     )
-    shtab.add_argument_to(
-        main_parser,
-        ["-s", "--print-completion"],
-        parent=main_parser,
+    _add_shared_args(main_parser)
+    main_parser.add_argument(
+        "-s",
+        "--print-completion",
+        choices=_COMPLETION_SHELLS,
+        default=None,
+        action=_PrintCompletionAction,
         help="Print completion script.",
     )
     subparsers = main_parser.add_subparsers(
@@ -167,16 +251,14 @@ def get_cli_parser():
         required=False,
         title="subcommands",
     )
-    subparsers.add_parser("ls", parents=[shared_parser], help="List all collections.")
+    add_subparser("ls", help="List all collections.")
 
-    vectorise_parser = subparsers.add_parser(
-        "vectorise",
-        parents=[shared_parser, chunkinng_parser],
-        help="Vectorise and send documents to chromadb.",
+    vectorise_parser = add_subparser(
+        "vectorise", chunking=True, help="Vectorise and send documents to chromadb."
     )
     vectorise_parser.add_argument(
         "file_paths", nargs="+", help="Paths to files to be vectorised."
-    ).complete = shtab.FILE
+    ).complete = _FILE_COMPLETION
     vectorise_parser.add_argument(
         "--recursive",
         "-r",
@@ -192,10 +274,8 @@ def get_cli_parser():
         help="Force to vectorise the file(s) against the gitignore.",
     )
 
-    query_parser = subparsers.add_parser(
-        "query",
-        parents=[shared_parser, chunkinng_parser],
-        help="Send query to retrieve documents.",
+    query_parser = add_subparser(
+        "query", chunking=True, help="Send query to retrieve documents."
     )
     query_parser.add_argument("query", nargs="+", help="Query keywords.")
     query_parser.add_argument(
@@ -206,7 +286,7 @@ def get_cli_parser():
     )
     query_parser.add_argument(
         "--exclude", nargs="*", help="Files to exclude from query results."
-    ).complete = shtab.FILE
+    ).complete = _FILE_COMPLETION
     query_parser.add_argument(
         "--absolute",
         default=False,
@@ -215,18 +295,16 @@ def get_cli_parser():
     )
     query_parser.add_argument(
         "--include",
-        choices=list(i.value for i in QueryInclude),
+        choices=_QUERY_INCLUDE_VALUES,
         nargs="+",
         help="What to include in the final output.",
         default=["path", "document"],
     )
 
-    subparsers.add_parser("drop", parents=[shared_parser], help="Remove a collection.")
+    add_subparser("drop", help="Remove a collection.")
 
-    init_parser = subparsers.add_parser(
-        "init",
-        parents=[shared_parser],
-        help="Initialise a directory as VectorCode project root.",
+    init_parser = add_subparser(
+        "init", help="Initialise a directory as VectorCode project root."
     )
     init_parser.add_argument(
         "--force",
@@ -236,12 +314,8 @@ def get_cli_parser():
         help="Wipe current project config and overwrite with global config (if it exists).",
     )
 
-    subparsers.add_parser(
-        "version", parents=[shared_parser], help="Print the version number."
-    )
-    check_parser = subparsers.add_parser(
-        "check", parents=[shared_parser], help="Check for project-local setup."
-    )
+    add_subparser("version", help="Print the version number.")
+    check_parser = add_subparser("check", help="Check for project-local setup.")
 
     check_parser.add_argument(
         "check_item",
@@ -250,127 +324,128 @@ def get_cli_parser():
         help=f"Item to be checked. Possible options: [{', '.join(CHECK_OPTIONS)}]",
     )
 
-    subparsers.add_parser(
-        "update",
-        parents=[shared_parser],
-        help="Update embeddings in the database for indexed files.",
-    )
+    add_subparser("update", help="Update embeddings in the database for indexed files.")
 
-    subparsers.add_parser(
-        "clean",
-        parents=[shared_parser],
-        help="Remove empty collections in the database.",
-    )
+    add_subparser("clean", help="Remove empty collections in the database.")
     return main_parser
 
 
-async def parse_cli_args(args: Optional[Sequence[str]] = None):
+# Maps a subcommand to a function that extracts its `Config` fields from the
+# parsed arguments. Fields that are not extracted keep their defaults.
+_ACTION_ARG_EXTRACTORS: dict[str, Callable[[argparse.Namespace], dict[str, Any]]] = {
+    "vectorise": lambda args: {
+        "files": args.file_paths,
+        "recursive": args.recursive,
+        "force": args.force,
+        "chunk_size": args.chunk_size,
+        "overlap_ratio": args.overlap,
+    },
+    "query": lambda args: {
+        "query": args.query,
+        "n_result": args.number,
+        "query_multiplier": args.multiplier,
+        "query_exclude": args.exclude,
+        "use_absolute_path": args.absolute,
+        "include": [QueryInclude(i) for i in args.include],
+    },
+    "check": lambda args: {"check_item": args.check_item},
+    "init": lambda args: {"force": args.force},
+}
+
+
+def parse_cli_args(args: Optional[Sequence[str]] = None):
     main_parser = get_cli_parser()
     main_args = main_parser.parse_args(args)
     if main_args.action is None:
         main_args = main_parser.parse_args(["--help"])
 
-    files = []
-    query = None
-    recursive = False
-    number_of_result = 1
-    force = False
-    chunk_size = -1
-    overlap_ratio = 0.2
-    query_multiplier = -1
-    query_exclude = []
-    query_include = ["path", "document"]
-    check_item = None
-    absolute = False
-    match main_args.action:
-        case "vectorise":
-            files = main_args.file_paths
-            recursive = main_args.recursive
-            force = main_args.force
-            chunk_size = main_args.chunk_size
-            overlap_ratio = main_args.overlap
-        case "query":
-            query = main_args.query
-            number_of_result = main_args.number
-            query_multiplier = main_args.multiplier
-            query_exclude = main_args.exclude
-            absolute = main_args.absolute
-            query_include = main_args.include
-        case "check":
-            check_item = main_args.check_item
-        case "init":
-            force = main_args.force
+    extract_action_args = _ACTION_ARG_EXTRACTORS.get(main_args.action)
+    action_args = {} if extract_action_args is None else extract_action_args(main_args)
     return Config(
         no_stderr=main_args.no_stderr,
         action=CliAction(main_args.action),
-        files=files,
         project_root=main_args.project_root,
-        query=query,
-        recursive=recursive,
-        n_result=number_of_result,
         pipe=main_args.pipe,
-        force=force,
-        chunk_size=chunk_size,
-        overlap_ratio=overlap_ratio,
-        query_multiplier=query_multiplier,
-        query_exclude=query_exclude,
-        check_item=check_item,
-        use_absolute_path=absolute,
-        include=[QueryInclude(i) for i in query_include],
+        **action_args,
     )
 
 
 def expand_envs_in_dict(d: dict):
     if not isinstance(d, dict):
         return
+    serialized = repr(d)
+    if "$" not in serialized and "%" not in serialized:
+        # nothing to expand.
+        return
     stack = [d]
     while stack:
         curr = stack.pop()
-        for k in curr.keys():
-            if isinstance(curr[k], str):
-                curr[k] = os.path.expandvars(curr[k])
-            elif isinstance(curr[k], dict):
-                stack.append(curr[k])
-
-
-async def load_config_file(path: Optional[PathLike] = None):
+        for k, v in curr.items():
+            if isinstance(v, str):
+                if "$" in v or "%" in v:
+                    curr[k] = os.path.expandvars(v)
+            elif isinstance(v, dict):
+                stack.append(v)
+
+
+@functools.lru_cache(maxsize=8)
+def _read_config_file(path: str, mtime_ns: int, size: int) -> dict[str, Any]:
+    """
+    Parse a JSON config file and keep the keys in `CONFIG_FILE_DEFAULTS`. `mtime_ns`
+    and `size` are only used as part of the cache key, so that the cached result
+    is dropped when the file changes.
+    """
+    with open(path, "rb") as fin:
+        config = _json_loads(fin.read())
+    # Unknown top-level entries would otherwise be kept in the cache, deep-copied
+    # and scanned for env vars on every load.
+    return {k: v for k, v in config.items() if k in CONFIG_FILE_DEFAULTS}
+
+
+def load_config_file(path: Optional[PathLike] = None):
     """Load config file from ~/.config/vectorcode/config.json"""
     if path is None:
         path = GLOBAL_CONFIG_PATH
-    if os.path.isfile(path):
-        with open(path) as fin:
-            config = json.load(fin)
+    try:
+        file_stat = os.stat(path)
+    except OSError:
+        return Config()
+    if stat.S_ISREG(file_stat.st_mode):
+        config = copy.deepcopy(
+            _read_config_file(str(path), file_stat.st_mtime_ns, file_stat.st_size)
+        )
         expand_envs_in_dict(config)
-        return await Config.import_from(config)
+        return Config.import_from(config)
     return Config()
 
 
-async def find_project_config_dir(start_from: PathLike = "."):
+def find_project_config_dir(start_from: PathLike = "."):
     """Returns the project-local config directory."""
-    current_dir = Path(start_from).resolve()
+    parts = Path(start_from).resolve().parts
     project_root_anchors = [".vectorcode", ".git"]
-    while current_dir:
+    for depth in range(len(parts), 0, -1):
+        current_dir = os.path.join(*parts[:depth])
         for anchor in project_root_anchors:
             to_be_checked = os.path.join(current_dir, anchor)
             if os.path.isdir(to_be_checked):
                 return to_be_checked
-        parent = current_dir.parent
-        if parent.resolve() == current_dir:
-            return
-        current_dir = parent.resolve()
 
 
 def find_project_root(
     start_from: PathLike, root_anchor: PathLike = ".vectorcode"
 ) -> str | None:
-    start_from = Path(start_from)
-    if os.path.isfile(start_from):
-        start_from = start_from.parent
+    current_dir = os.path.abspath(os.fspath(start_from))
+    if os.path.isfile(current_dir):
+        current_dir = os.path.dirname(current_dir)
+    root_anchor = os.fspath(root_anchor)
 
-    while start_from:
-        if (start_from / Path(root_anchor)).is_dir():
-            return str(start_from.absolute())
-        start_from = start_from.parent
+    while True:
+        if os.path.isdir(os.path.join(current_dir, root_anchor)):
+            return current_dir
+        parent = os.path.dirname(current_dir)
+        if parent == current_dir:
+            return None
+        current_dir = parent
 
 
 def expand_path(path: PathLike, absolute: bool = False) -> PathLike:
@@ -380,17 +455,149 @@ def expand_path(path: PathLike, absolute: bool = False) -> PathLike:
     return expanded
 
 
-async def expand_globs(
-    paths: list[PathLike], recursive: bool = False
-) -> list[PathLike]:
-    result = set()
-    stack = paths
+def _list_dir(
+    directory: str, listings: dict[str, list[os.DirEntry]]
+) -> list[os.DirEntry]:
+    """
+    Return the entries in `directory` (or an empty list if it can't be read).
+    Listings are stored in `listings`, which lives for one `expand_globs` call,
+    so that directories visited by several patterns are only read once.
+    """
+    listing = listings.get(directory)
+    if listing is None:
+        try:
+            with os.scandir(directory) as it:
+                listing = list(it)
+        except OSError:
+            listing = []
+        listings[directory] = listing
+    return listing
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_glob_component(component: str) -> re.Pattern:
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    return re.compile(fnmatch.translate(component), flags)
+
+
+def _match_components(
+    base: str,
+    components: list[str],
+    recursive: bool,
+    dir_only: bool,
+    listings: dict[str, list[os.DirEntry]],
+) -> Iterator[str]:
+    """
+    Match `components` one at a time against the directory tree below `base`.
+    Subtrees that can't match the current component are never listed. When
+    `dir_only` is set (the pattern ends with a separator), only directories are
+    matched by the last component, and they're yielded with a trailing
+    separator, like `glob` does.
+    """
+    if not components:
+        yield base
+        return
+    component, rest = components[0], components[1:]
+    if recursive and component == "**":
+        dirs = [base]
+        while dirs:
+            curr = dirs.pop()
+            if rest:
+                yield from _match_components(curr, rest, recursive, dir_only, listings)
+            elif curr == base:
+                # like `glob`, a trailing `**` also matches the directory itself.
+                if base:
+                    yield os.path.join(base, "")
+            else:
+                yield os.path.join(curr, "") if dir_only else curr
+            for entry in _list_dir(curr or os.curdir, listings):
+                if entry.name.startswith("."):
+                    continue
+                path = os.path.join(curr, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(path)
+                elif not rest and not dir_only:
+                    yield path
+    elif not glob.has_magic(component):
+        path = os.path.join(base, component)
+        if rest:
+            yield from _match_components(path, rest, recursive, dir_only, listings)
+        elif dir_only:
+            if os.path.isdir(path):
+                yield os.path.join(path, "")
+        elif os.path.lexists(path):
+            yield path
+    else:
+        matcher = _compile_glob_component(component)
+        include_hidden = component.startswith(".")
+        for entry in _list_dir(base or os.curdir, listings):
+            if entry.name.startswith(".") and not include_hidden:
+                continue
+            if not matcher.match(entry.name):
+                continue
+            path = os.path.join(base, entry.name)
+            if not rest:
+                if not dir_only:
+                    yield path
+                elif entry.is_dir():
+                    yield os.path.join(path, "")
+            elif entry.is_dir():
+                yield from _match_components(path, rest, recursive, dir_only, listings)
+
+
+def _iglob(
+    pattern: str, recursive: bool, listings: dict[str, list[os.DirEntry]]
+) -> Iterator[str]:
+    """
+    A streaming replacement of `glob.iglob` that compiles each path component
+    only once and prunes directories that can't match the pattern.
+    """
+    drive, path = os.path.splitdrive(pattern)
+    separators = os.sep + (os.altsep or "")
+    base = drive
+    if path[:1] and path[0] in separators:
+        base += os.sep
+    components = [i for i in re.split(f"[{re.escape(separators)}]", path) if i]
+    # a trailing separator restricts the matches to directories.
+    dir_only = bool(components) and path[-1] in separators
+    yield from _match_components(base, components, recursive, dir_only, listings)
+
+
+def _walk_files(
+    directory: PathLike, listings: dict[str, list[os.DirEntry]]
+) -> Iterator[str]:
+    """
+    Yield the non-hidden files under `directory`, skipping hidden directories
+    (same as `glob.glob("**/*", recursive=True)`). This relies on the file
+    types reported by `os.scandir`, so most entries don't need an extra `stat`,
+    and shares the directory listings cached by the glob matcher.
+    """
+    dirs = [str(directory)]
+    while dirs:
+        for entry in _list_dir(dirs.pop(), listings):
+            if entry.name.startswith("."):
+                continue
+            if entry.is_file():
+                yield entry.path
+            elif entry.is_dir(follow_symlinks=False):
+                dirs.append(entry.path)
+
+
+def expand_globs(paths: list[PathLike], recursive: bool = False) -> list[PathLike]:
+    result = []
+    listings: dict[str, list[os.DirEntry]] = {}
+    stack = list(paths or [])
     while stack:
         curr = stack.pop()
-        if os.path.isfile(curr):
-            result.add(expand_path(curr))
-        elif "*" in str(curr):
-            stack.extend(glob.glob(str(curr), recursive=recursive))
-        elif os.path.isdir(curr) and recursive:
-            stack.extend(glob.glob(os.path.join(curr, "**", "*"), recursive=recursive))
-    return list(result)
+        if "*" in str(curr):
+            stack.extend(_iglob(str(curr), recursive, listings))
+            continue
+        try:
+            mode = os.stat(curr).st_mode
+        except OSError:
+            continue
+        if stat.S_ISREG(mode):
+            result.append(expand_path(curr))
+        elif stat.S_ISDIR(mode) and recursive:
+            result.extend(expand_path(i) for i in _walk_files(curr, listings))
+    return list(dict.fromkeys(result))
@@ -1,10 +1,12 @@
 import asyncio
+import functools
 import hashlib
+import json
 import os
 import socket
 import subprocess
 import sys
-from typing import Any, AsyncGenerator, Coroutine
+from typing import Any, AsyncGenerator, Coroutine, Optional
 
 import chromadb
 import httpx
@@ -15,55 +17,117 @@ from chromadb.utils import embedding_functions
 
 from vectorcode.cli_utils import Config, expand_path
 
+_HOSTNAME = socket.gethostname()
+_USERNAME = os.environ.get("USER", os.environ.get("USERNAME", "DEFAULT_USER"))
+_VALID_USERNAMES = frozenset(
+    (os.environ.get("USER"), os.environ.get("USERNAME"), "DEFAULT_USER")
+)
+_USERNAME_BYTES_PREFIX = f"{_USERNAME}@{_HOSTNAME}:".encode()
+
 
 async def get_collections(
     client: AsyncClientAPI,
 ) -> AsyncGenerator[AsyncCollection, None]:
-    for collection_name in await client.list_collections():
-        collection = await client.get_collection(collection_name, None)
+    semaphore = asyncio.Semaphore(32)
+
+    async def fetch(collection_name: str) -> AsyncCollection:
+        async with semaphore:
+            return await client.get_collection(collection_name, None)
+
+    collections = await asyncio.gather(
+        *(fetch(name) for name in await client.list_collections())
+    )
+    for collection in collections:
         meta = collection.metadata
         if meta is None:
             continue
         if meta.get("created-by") != "VectorCode":
             continue
-        if meta.get("username") not in (
-            os.environ.get("USER"),
-            os.environ.get("USERNAME"),
-            "DEFAULT_USER",
-        ):
+        if meta.get("username") not in _VALID_USERNAMES:
             continue
-        if meta.get("hostname") != socket.gethostname():
+        if meta.get("hostname") != _HOSTNAME:
             continue
         yield collection
 
 
+_HEARTBEAT_CLIENT: Optional[httpx.AsyncClient] = None
+_HEARTBEAT_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client for heartbeat requests, so that repeated polls reuse
+    pooled connections. A new client is created when the previous one has been
+    closed or belongs to a different event loop.
+    """
+    global _HEARTBEAT_CLIENT, _HEARTBEAT_CLIENT_LOOP
+    loop = asyncio.get_running_loop()
+    if (
+        _HEARTBEAT_CLIENT is None
+        or _HEARTBEAT_CLIENT.is_closed
+        or _HEARTBEAT_CLIENT_LOOP is not loop
+    ):
+        _HEARTBEAT_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(2.0),
+            limits=httpx.Limits(max_keepalive_connections=4),
+        )
+        _HEARTBEAT_CLIENT_LOOP = loop
+    return _HEARTBEAT_CLIENT
+
+
+async def close_http_client():
+    """Close the shared heartbeat client if it was created in the current loop."""
+    global _HEARTBEAT_CLIENT, _HEARTBEAT_CLIENT_LOOP
+    client = _HEARTBEAT_CLIENT
+    if client is not None and _HEARTBEAT_CLIENT_LOOP is asyncio.get_running_loop():
+        await client.aclose()
+    _HEARTBEAT_CLIENT = None
+    _HEARTBEAT_CLIENT_LOOP = None
+
+
+_TRY_SERVER_TIMEOUT = httpx.Timeout(2.0, connect=0.5)
+
+
 async def try_server(host: str, port: int):
     url = f"http://{host}:{port}/api/v1/heartbeat"
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url=url)
-            return response.status_code == 200
-    except (httpx.ConnectError, httpx.ConnectTimeout):
+        # bound the connection for hosts that drop packets instead of refusing
+        # them, but give a reachable server the usual time to respond.
+        response = await _get_http_client().get(url=url, timeout=_TRY_SERVER_TIMEOUT)
+        return response.status_code == 200
+    except (httpx.ConnectError, httpx.ConnectTimeout, OSError):
         return False
 
 
 async def wait_for_server(host, port, timeout=10):
     # Poll the server until it's ready or timeout is reached
     url = f"http://{host}:{port}/api/v1/heartbeat"
-    start_time = asyncio.get_event_loop().time()
-    async with httpx.AsyncClient() as client:
-        while True:
-            try:
-                response = await client.get(url)
-                if response.status_code == 200:
-                    return
-            except httpx.RequestError:
-                pass  # Server is not yet ready
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    client = _get_http_client()
+    delay = 0.01
+    while True:
+        try:
+            # a cheap TCP probe before sending the heartbeat request.
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout=0.5
+            )
+            writer.close()
+            await writer.wait_closed()
+            response = await client.get(url)
+            if response.status_code == 200:
+                return
+        except (OSError, asyncio.TimeoutError, httpx.RequestError):
+            pass  # Server is not yet ready
+
+        if loop.time() - start_time > timeout:
+            raise TimeoutError(f"Server did not start within {timeout} seconds.")
 
-            if asyncio.get_event_loop().time() - start_time > timeout:
-                raise TimeoutError(f"Server did not start within {timeout} seconds.")
+        await asyncio.sleep(delay)  # Wait before retrying
+        delay = min(delay * 2, 0.2)
 
-            await asyncio.sleep(0.1)  # Wait before retrying
+
+_SERVER_START_ATTEMPTS = 3
 
 
 async def start_server(configs: Config):
@@ -75,31 +139,60 @@ async def start_server(configs: Config):
             file=sys.stderr,
         )
         db_path = os.path.expanduser("~/.local/share/vectorcode/chromadb/")
-    env = os.environ.copy()
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(("", 0))  # OS selects a free ephemeral port
-        configs.port = int(s.getsockname()[1])
-    env.update({"ANONYMIZED_TELEMETRY": "False"})
-    process = await asyncio.create_subprocess_exec(
-        sys.executable,
-        "-m",
-        "chromadb.cli.cli",
-        "run",
-        "--host",
-        "localhost",
-        "--port",
-        str(configs.port),
-        "--path",
-        db_path,
-        "--log-path",
-        os.path.join(str(configs.project_root), "chroma.log"),
-        stdout=subprocess.DEVNULL,
-        stderr=sys.stderr,
-        env=env,
+    env = {**os.environ, "ANONYMIZED_TELEMETRY": "False"}
+    for attempt in range(_SERVER_START_ATTEMPTS):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+            s.bind(("", 0))  # OS selects a free ephemeral port
+            configs.port = int(s.getsockname()[1])
+        process = await asyncio.create_subprocess_exec(
+            sys.executable,
+            "-m",
+            "chromadb.cli.cli",
+            "run",
+            "--host",
+            "localhost",
+            "--port",
+            str(configs.port),
+            "--path",
+            db_path,
+            "--log-path",
+            os.path.join(str(configs.project_root), "chroma.log"),
+            stdout=subprocess.DEVNULL,
+            stderr=sys.stderr,
+            env=env,
+        )
+
+        ready = asyncio.create_task(wait_for_server(configs.host, configs.port))
+        exited = asyncio.create_task(process.wait())
+        try:
+            await asyncio.wait((ready, exited), return_when=asyncio.FIRST_COMPLETED)
+            if exited.done():
+                # the server exited before it was ready, most likely because another
+                # process took the port before chromadb bound to it. Try another port.
+                continue
+            ready.result()
+        except BaseException:
+            # don't leave an orphaned server behind when startup fails.
+            await _stop_process(process)
+            raise
+        finally:
+            ready.cancel()
+            exited.cancel()
+        return process
+    raise ChildProcessError(
+        f"The Chromadb server exited with code {process.returncode} "
+        f"after {_SERVER_START_ATTEMPTS} attempts."
     )
 
-    await wait_for_server(configs.host, configs.port)
-    return process
+
+async def _stop_process(process: asyncio.subprocess.Process):
+    if process.returncode is None:
+        try:
+            process.terminate()
+        except ProcessLookupError:
+            # exited in the meantime.
+            pass
+    await process.wait()
 
 
 def get_client(configs: Config) -> Coroutine[Any, Any, AsyncClientAPI]:
@@ -119,27 +212,40 @@ def get_client(configs: Config) -> Coroutine[Any, Any, AsyncClientAPI]:
     )
 
 
+@functools.lru_cache(maxsize=256)
+def _hash_collection_path(full_path: str) -> str:
+    return hashlib.sha256(_USERNAME_BYTES_PREFIX + full_path.encode()).hexdigest()[:63]
+
+
 def get_collection_name(full_path: str) -> str:
-    full_path = str(expand_path(full_path, absolute=True))
-    hasher = hashlib.sha256()
-    hasher.update(
-        f"{os.environ.get('USER', os.environ.get('USERNAME', 'DEFAULT_USER'))}@{socket.gethostname()}:{full_path}".encode()
-    )
-    collection_id = hasher.hexdigest()[:63]
-    return collection_id
+    # the expansion depends on the working directory and the environment, so
+    # only the hashing of the absolute path is cached.
+    return _hash_collection_path(str(expand_path(full_path, absolute=True)))
+
+
+@functools.lru_cache(maxsize=8)
+def _build_ef(name: str, params_json: str) -> chromadb.EmbeddingFunction:
+    return getattr(embedding_functions, name)(**json.loads(params_json))
+
+
+def _get_ef(name: str, params: dict[str, Any]) -> chromadb.EmbeddingFunction:
+    try:
+        params_json = json.dumps(params, sort_keys=True)
+    except TypeError:
+        # not serialisable, so it can't be used as a cache key.
+        return getattr(embedding_functions, name)(**params)
+    return _build_ef(name, params_json)
 
 
 def get_embedding_function(configs: Config) -> chromadb.EmbeddingFunction:
     try:
-        return getattr(embedding_functions, configs.embedding_function)(
-            **configs.embedding_params
-        )
+        return _get_ef(configs.embedding_function, configs.embedding_params)
     except AttributeError:
         print(
             f"Failed to use {configs.embedding_function}. Falling back to Sentence Transformer.",
             file=sys.stderr,
         )
-        return embedding_functions.SentenceTransformerEmbeddingFunction()
+        return _get_ef("SentenceTransformerEmbeddingFunction", {})
 
 
 async def get_collection(
@@ -155,9 +261,9 @@ async def get_collection(
     embedding_function = get_embedding_function(configs)
     collection_meta = {
         "path": full_path,
-        "hostname": socket.gethostname(),
+        "hostname": _HOSTNAME,
         "created-by": "VectorCode",
-        "username": os.environ.get("USER", os.environ.get("USERNAME", "DEFAULT_USER")),
+        "username": _USERNAME,
         "embedding_function": configs.embedding_function,
     }
 
@@ -169,9 +275,8 @@ async def get_collection(
         embedding_function=embedding_function,
     )
     if (
-        not collection.metadata.get("hostname") == socket.gethostname()
-        or collection.metadata.get("username")
-        not in (os.environ.get("USER"), os.environ.get("USERNAME"), "DEFAULT_USER")
+        not collection.metadata.get("hostname") == _HOSTNAME
+        or collection.metadata.get("username") not in _VALID_USERNAMES
         or not collection.metadata.get("created-by") == "VectorCode"
     ):
         raise IndexError(
@@ -25,7 +25,12 @@ from vectorcode.cli_utils import (
     load_config_file,
     parse_cli_args,
 )
-from vectorcode.common import get_client, get_collection, try_server
+from vectorcode.common import (
+    close_http_client,
+    get_client,
+    get_collection,
+    try_server,
+)
 from vectorcode.subcommands.clean import run_clean_on_client
 from vectorcode.subcommands.query import get_query_result_files
 
@@ -36,25 +41,37 @@ cached_collections: dict[str, AsyncCollection] = {}
 DEFAULT_PROJECT_ROOT: str | None = None
 
 
+_cache_locks: dict[str, asyncio.Lock] = {}
+
+
 async def make_caches(project_root: str):
     assert os.path.isabs(project_root)
-    if cached_project_configs.get(project_root) is None:
-        config_file = os.path.join(project_root, ".vectorcode", "config.json")
-        if os.path.isfile(config_file):
-            config_file = None
-        cached_project_configs[project_root] = await load_config_file(config_file)
-    config = cached_project_configs[project_root]
-    config.project_root = project_root
-    host, port = config.host, config.port
-    if not await try_server(host, port):
-        raise ConnectionError(
-            "Failed to find an existing ChromaDB server, which is a hard requirement for LSP mode!"
-        )
-    if cached_clients.get((host, port)) is None:
-        cached_clients[(host, port)] = await get_client(config)
-    client = cached_clients[(host, port)]
-    if cached_collections.get(project_root) is None:
-        cached_collections[project_root] = await get_collection(client, config, True)
+    lock = _cache_locks.setdefault(project_root, asyncio.Lock())
+    async with lock:
+        if cached_project_configs.get(project_root) is None:
+            config_file = os.path.join(project_root, ".vectorcode", "config.json")
+            if not os.path.isfile(config_file):
+                config_file = None
+            cached_project_configs[project_root] = load_config_file(config_file)
+        config = cached_project_configs[project_root]
+        config.project_root = project_root
+        host, port = config.host, config.port
+        if not await try_server(host, port):
+            raise ConnectionError(
+                "Failed to find an existing ChromaDB server, which is a hard requirement for LSP mode!"
+            )
+        if cached_clients.get((host, port)) is None:
+            cached_clients[(host, port)] = await get_client(config)
+        client = cached_clients[(host, port)]
+        if cached_collections.get(project_root) is None:
+            cached_collections[project_root] = await get_collection(
+                client, config, True
+            )
+
+
+def _read_file(path: str) -> str:
+    with open(path) as fin:
+        return fin.read()
 
 
 def get_arg_parser():
@@ -92,7 +109,7 @@ async def lsp_start() -> int:
     async def execute_command(ls: LanguageServer, *args):
         global DEFAULT_PROJECT_ROOT
         start_time = time.time()
-        parsed_args = await parse_cli_args(args[0])
+        parsed_args = parse_cli_args(args[0])
         if parsed_args.project_root is None:
             assert DEFAULT_PROJECT_ROOT is not None, (
                 "Failed to automatically resolve project root!"
@@ -104,9 +121,9 @@ async def lsp_start() -> int:
 
         parsed_args.project_root = os.path.abspath(str(parsed_args.project_root))
         await make_caches(parsed_args.project_root)
-        final_configs = await cached_project_configs[
-            parsed_args.project_root
-        ].merge_from(parsed_args)
+        final_configs = cached_project_configs[parsed_args.project_root].merge_from(
+            parsed_args
+        )
         final_configs.pipe = True
         progress_token = str(uuid.uuid4())
         collection = cached_collections[str(final_configs.project_root)]
@@ -120,14 +137,21 @@ async def lsp_start() -> int:
                         message="Retrieving from VectorCode",
                     ),
                 )
-                final_results = []
-                for path in await get_query_result_files(
-                    collection=collection,
-                    configs=final_configs,
-                ):
-                    if os.path.isfile(path):
-                        with open(path) as fin:
-                            final_results.append({"path": path, "document": fin.read()})
+                paths = [
+                    path
+                    for path in await get_query_result_files(
+                        collection=collection,
+                        configs=final_configs,
+                    )
+                    if os.path.isfile(path)
+                ]
+                documents = await asyncio.gather(
+                    *(asyncio.to_thread(_read_file, path) for path in paths)
+                )
+                final_results = [
+                    {"path": path, "document": document}
+                    for path, document in zip(paths, documents)
+                ]
                 ls.progress.end(
                     progress_token,
                     types.WorkDoneProgressEnd(
@@ -147,6 +171,7 @@ async def lsp_start() -> int:
         for client in cached_clients.values():
             # clean up empty collections.
             await run_clean_on_client(client, True)
+        await close_http_client()
 
     return 0
 
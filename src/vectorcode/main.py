@@ -12,7 +12,7 @@ from vectorcode.cli_utils import (
     load_config_file,
     parse_cli_args,
 )
-from vectorcode.common import start_server, try_server
+from vectorcode.common import close_http_client, start_server, try_server
 from vectorcode.subcommands import (
     check,
     clean,
@@ -26,10 +26,10 @@ from vectorcode.subcommands import (
 
 
 async def async_main():
-    cli_args = await parse_cli_args()
+    cli_args = parse_cli_args()
     if cli_args.no_stderr:
         sys.stderr = open(os.devnull, "w")
-    project_dir = await find_project_config_dir(cli_args.project_root or ".")
+    project_dir = find_project_config_dir(cli_args.project_root or ".")
 
     try:
         if project_dir is not None:
@@ -41,14 +41,14 @@ async def async_main():
             )
             if os.path.isfile(project_config_file):
                 # has project-local config. use it
-                final_configs = await (
-                    await load_config_file(project_config_file)
-                ).merge_from(cli_args)
+                final_configs = load_config_file(project_config_file).merge_from(
+                    cli_args
+                )
             else:
                 # no project-local config. use global config.
-                final_configs = await (await load_config_file()).merge_from(cli_args)
+                final_configs = load_config_file().merge_from(cli_args)
         else:
-            final_configs = await (await load_config_file()).merge_from(cli_args)
+            final_configs = load_config_file().merge_from(cli_args)
             if final_configs.project_root is None:
                 final_configs.project_root = "."
     except IOError as e:
@@ -99,6 +99,7 @@ async def async_main():
         if server_process is not None:
             server_process.terminate()
             await server_process.wait()
+        await close_http_client()
         return return_val
 
 
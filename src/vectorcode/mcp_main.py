@@ -22,15 +22,13 @@ mcp = FastMCP("VectorCode")
 
 async def mcp_server():
     sys.stderr = open(os.devnull, "w")
-    local_config_dir = await find_project_config_dir(".")
+    local_config_dir = find_project_config_dir(".")
     if local_config_dir is None:
         project_root = os.path.abspath(".")
     else:
         project_root = str(Path(local_config_dir).parent.resolve())
 
-    config = await load_config_file(
-        os.path.join(project_root, ".vectorcode", "config.json")
-    )
+    config = load_config_file(os.path.join(project_root, ".vectorcode", "config.json"))
     config.project_root = project_root
     client = await get_client(config)
     collection = await get_collection(client, config)
@@ -60,9 +58,7 @@ async def mcp_server():
         """
         result_paths = await get_query_result_files(
             collection=collection,
-            configs=await config.merge_from(
-                Config(n_result=n_query, query=query_messages)
-            ),
+            configs=config.merge_from(Config(n_result=n_query, query=query_messages)),
         )
         results = []
         for path in result_paths:
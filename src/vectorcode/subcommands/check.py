@@ -9,7 +9,7 @@ async def check(configs: Config) -> int:
     assert configs.check_item.lower() in CHECK_OPTIONS
     match configs.check_item:
         case "config":
-            project_local_config = await find_project_config_dir(".")
+            project_local_config = find_project_config_dir(".")
             if project_local_config is None:
                 print("Failed!", file=sys.stderr)
                 return 1
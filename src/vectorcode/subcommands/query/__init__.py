@@ -26,7 +26,7 @@ async def get_query_result_files(
 
     configs.query_exclude = [
         expand_path(i, True)
-        for i in await expand_globs(configs.query_exclude)
+        for i in expand_globs(configs.query_exclude)
         if os.path.isfile(i)
     ]
     if (await collection.count()) == 0:
@@ -2,6 +2,7 @@ import asyncio
 import os
 import sys
 from asyncio import Lock
+from typing import Iterable
 
 import tqdm
 from chromadb.api.types import IncludeEnum
@@ -9,7 +10,59 @@ from chromadb.errors import InvalidCollectionException
 
 from vectorcode.cli_utils import Config
 from vectorcode.common import get_client, get_collection, verify_ef
-from vectorcode.subcommands.vectorise import chunked_add, show_stats
+from vectorcode.subcommands.vectorise import (
+    chunked_add,
+    delete_paths,
+    get_concurrency,
+    hash_chunking_params,
+    hash_file,
+    show_stats,
+    wait_with_progress,
+)
+
+METADATA_PAGE_SIZE = 10_000
+
+
+def _list_files(directory: str) -> set[str] | None:
+    """
+    Return the names of the regular files in `directory`, or None if it can't be
+    listed.
+    """
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name for entry in entries if entry.is_file()}
+    except OSError:
+        return None
+
+
+def _existing_files(directory: str, paths: list[str]) -> set[str]:
+    listing = _list_files(directory)
+    if listing is None:
+        # the directory may still be searchable without being readable.
+        return {path for path in paths if os.path.isfile(path)}
+    return {path for path in paths if os.path.basename(path) in listing}
+
+
+async def split_existing_files(paths: Iterable[str]) -> tuple[set[str], set[str]]:
+    """
+    Split `paths` into (existing files, missing files). Each parent directory is
+    listed once in a worker thread instead of stat-ing every path in the loop.
+    """
+    paths_by_dir: dict[str, list[str]] = {}
+    for path in paths:
+        paths_by_dir.setdefault(os.path.dirname(path), []).append(path)
+    existing = await asyncio.gather(
+        *(
+            asyncio.to_thread(_existing_files, directory, dir_paths)
+            for directory, dir_paths in paths_by_dir.items()
+        )
+    )
+    files: set[str] = set()
+    orphanes: set[str] = set()
+    for dir_paths, dir_files in zip(paths_by_dir.values(), existing):
+        files.update(dir_files)
+        orphanes.update(path for path in dir_paths if path not in dir_files)
+    return files, orphanes
 
 
 async def update(configs: Config) -> int:
@@ -28,26 +81,60 @@ async def update(configs: Config) -> int:
     if collection is None or not verify_ef(collection, configs):
         return 1
 
-    metas = (await collection.get(include=[IncludeEnum.metadatas]))["metadatas"]
-    if metas is None:
-        return 0
-    files_gen = (str(meta.get("path", "")) for meta in metas)
-    files = set()
-    orphanes = set()
-    for file in files_gen:
-        if os.path.isfile(file):
-            files.add(file)
-        else:
-            orphanes.add(file)
-
-    stats = {"add": 0, "update": 0, "removed": len(orphanes)}
+    # fetch the metadata in pages so that large collections aren't loaded at once.
+    stored_hashes: dict[str, tuple[str | None, str | None]] = {}
+    offset = 0
+    while True:
+        metas = (
+            await collection.get(
+                include=[IncludeEnum.metadatas], limit=METADATA_PAGE_SIZE, offset=offset
+            )
+        )["metadatas"]
+        if metas is None and offset == 0:
+            return 0
+        if not metas:
+            break
+        for meta in metas:
+            stored_hashes[str(meta.get("path", ""))] = (
+                meta.get("sha256"),
+                meta.get("chunking_params"),
+            )
+        if len(metas) < METADATA_PAGE_SIZE:
+            break
+        offset += METADATA_PAGE_SIZE
+    files, orphanes = await split_existing_files(stored_hashes)
+    chunking_params = hash_chunking_params(configs)
+
+    async def get_file_hash(file: str) -> str | None:
+        try:
+            return await asyncio.to_thread(hash_file, file)
+        except OSError:
+            return None
+
+    file_hashes = dict(
+        zip(files, await asyncio.gather(*(get_file_hash(file) for file in files)))
+    )
+    # only skip the files whose content and chunking configs are both unchanged.
+    changed_files = [
+        file
+        for file, file_hash in file_hashes.items()
+        if file_hash is None or stored_hashes[file] != (file_hash, chunking_params)
+    ]
+
+    stats = {
+        "add": 0,
+        "update": 0,
+        "removed": len(orphanes),
+        "skipped": len(files) - len(changed_files),
+    }
     collection_lock = Lock()
     stats_lock = Lock()
     max_batch_size = await client.get_max_batch_size()
-    semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+    semaphore = asyncio.Semaphore(get_concurrency(configs))
+    embedding_lock = Lock()
 
     with tqdm.tqdm(
-        total=len(files), desc="Vectorising files...", disable=configs.pipe
+        total=len(changed_files), desc="Vectorising files...", disable=configs.pipe
     ) as bar:
         try:
             tasks = [
@@ -61,19 +148,19 @@ async def update(configs: Config) -> int:
                         configs,
                         max_batch_size,
                         semaphore,
+                        embedding_lock,
+                        file_hashes[file],
                     )
                 )
-                for file in files
+                for file in changed_files
             ]
-            for task in asyncio.as_completed(tasks):
-                await task
-                bar.update(1)
+            await wait_with_progress(tasks, bar)
         except asyncio.CancelledError:
             print("Abort.", file=sys.stderr)
             return 1
 
     if len(orphanes):
-        await collection.delete(where={"path": {"$in": list(orphanes)}})
+        await delete_paths(collection, orphanes)
 
     show_stats(configs, stats)
     return 0
@@ -3,6 +3,7 @@ import hashlib
 import json
 import os
 import sys
+import time
 import uuid
 from asyncio import Lock
 from typing import Iterable
@@ -15,7 +16,12 @@ from chromadb.api.types import IncludeEnum
 
 from vectorcode.chunking import FileChunker
 from vectorcode.cli_utils import Config, expand_globs, expand_path
-from vectorcode.common import get_client, get_collection, verify_ef
+from vectorcode.common import (
+    get_client,
+    get_collection,
+    get_embedding_function,
+    verify_ef,
+)
 
 
 def hash_str(string: str) -> str:
@@ -23,6 +29,41 @@ def hash_str(string: str) -> str:
     return hashlib.sha256(string.encode()).hexdigest()
 
 
+def hash_file(path: str) -> str:
+    """Return the sha-256 hash of the content of a file."""
+    with open(path, "rb") as fin:
+        return hashlib.file_digest(fin, "sha256").hexdigest()
+
+
+def hash_chunking_params(configs: Config) -> str:
+    """
+    Return the sha-256 hash of the configs that affect the stored chunks and
+    embeddings, so that `update` can tell when a file needs to be re-embedded.
+    """
+    return hash_str(
+        json.dumps(
+            {
+                "chunk_size": configs.chunk_size,
+                "overlap_ratio": configs.overlap_ratio,
+                "embedding_function": configs.embedding_function,
+                "embedding_params": configs.embedding_params,
+            },
+            sort_keys=True,
+            default=str,
+        )
+    )
+
+
+def get_concurrency(configs: Config) -> int:
+    """
+    Number of files to be processed at the same time. Vectorising is mostly
+    waiting for the database, so the default is higher than the CPU count.
+    """
+    if configs.concurrency > 0:
+        return configs.concurrency
+    return min(32, (os.cpu_count() or 1) * 4)
+
+
 def get_uuid() -> str:
     return uuid.uuid4().hex
 
@@ -36,7 +77,17 @@ async def chunked_add(
     configs: Config,
     max_batch_size: int,
     semaphore: asyncio.Semaphore,
+    embedding_lock: Lock,
+    file_hash: str | None = None,
 ):
+    """
+    Chunk and embed a file. `file_hash` is the sha-256 of the file content, if
+    the caller has already computed it.
+
+    `semaphore` limits the number of files being read at the same time, while
+    `embedding_lock` makes sure that only one file is embedded at a time, as the
+    embedding model is shared and already uses all the cores.
+    """
     full_path_str = str(expand_path(str(file_path), True))
     async with collection_lock:
         num_existing_chunks = len(
@@ -54,6 +105,9 @@ async def chunked_add(
 
     try:
         async with semaphore:
+            if file_hash is None:
+                file_hash = await asyncio.to_thread(hash_file, full_path_str)
+            chunking_params = hash_chunking_params(configs)
             with open(full_path_str) as fin:
                 chunks = list(
                     FileChunker(configs.chunk_size, configs.overlap_ratio).chunk(fin)
@@ -62,14 +116,26 @@ async def chunked_add(
                     # empty file
                     return
                 chunks.append(str(os.path.relpath(full_path_str, configs.project_root)))
+                # embed outside of the collection lock so that other files can
+                # be written to the database in the meantime.
+                async with embedding_lock:
+                    embeddings = await asyncio.to_thread(
+                        get_embedding_function(configs), chunks
+                    )
                 async with collection_lock:
                     for idx in range(0, len(chunks), max_batch_size):
                         inserted_chunks = chunks[idx : idx + max_batch_size]
                         await collection.add(
                             ids=[get_uuid() for _ in inserted_chunks],
                             documents=inserted_chunks,
+                            embeddings=embeddings[idx : idx + max_batch_size],
                             metadatas=[
-                                {"path": full_path_str} for _ in inserted_chunks
+                                {
+                                    "path": full_path_str,
+                                    "sha256": file_hash,
+                                    "chunking_params": chunking_params,
+                                }
+                                for _ in inserted_chunks
                             ],
                         )
     except UnicodeDecodeError:
@@ -84,6 +150,45 @@ async def chunked_add(
             stats["add"] += 1
 
 
+async def delete_paths(
+    collection: AsyncCollection, paths: Iterable[str], batch_size: int = 500
+):
+    """
+    Remove the documents of `paths` from the collection. Large `$in` filters are
+    slow on the server side, so the paths are deleted in batches.
+    """
+    paths = list(paths)
+    semaphore = asyncio.Semaphore(4)
+
+    async def delete_batch(batch: list[str]):
+        async with semaphore:
+            await collection.delete(where={"path": {"$in": batch}})
+
+    await asyncio.gather(
+        *(
+            delete_batch(paths[idx : idx + batch_size])
+            for idx in range(0, len(paths), batch_size)
+        )
+    )
+
+
+async def wait_with_progress(tasks: list[asyncio.Task], bar: tqdm.tqdm):
+    """
+    Wait for `tasks` to finish. The progress bar is refreshed every 64 finished
+    tasks or every 0.1s, whichever comes first.
+    """
+    done = 0
+    last_refresh = time.monotonic()
+    for task in asyncio.as_completed(tasks):
+        await task
+        done += 1
+        now = time.monotonic()
+        if done % 64 == 0 or now - last_refresh > 0.1:
+            bar.update(done - bar.n)
+            last_refresh = now
+    bar.update(done - bar.n)
+
+
 def show_stats(configs: Config, stats):
     if configs.pipe:
         print(json.dumps(stats))
@@ -91,8 +196,8 @@ def show_stats(configs: Config, stats):
         print(
             tabulate.tabulate(
                 [
-                    ["Added", "Updated", "Removed"],
-                    [stats["add"], stats["update"], stats["removed"]],
+                    ["Added", "Updated", "Removed", "Skipped"],
+                    [stats["add"], stats["update"], stats["removed"], stats["skipped"]],
                 ],
                 headers="firstrow",
             )
@@ -123,17 +228,18 @@ async def vectorise(configs: Config) -> int:
     if not verify_ef(collection, configs):
         return 1
     gitignore_path = os.path.join(str(configs.project_root), ".gitignore")
-    files = await expand_globs(configs.files or [], recursive=configs.recursive)
+    files = expand_globs(configs.files or [], recursive=configs.recursive)
     if os.path.isfile(gitignore_path) and not configs.force:
         with open(gitignore_path) as fin:
             gitignore_spec = pathspec.GitIgnoreSpec.from_lines(fin.readlines())
         files = exclude_paths_by_spec((str(i) for i in files), gitignore_spec)
 
-    stats = {"add": 0, "update": 0, "removed": 0}
+    stats = {"add": 0, "update": 0, "removed": 0, "skipped": 0}
     collection_lock = Lock()
     stats_lock = Lock()
     max_batch_size = await client.get_max_batch_size()
-    semaphore = asyncio.Semaphore(os.cpu_count() or 1)
+    semaphore = asyncio.Semaphore(get_concurrency(configs))
+    embedding_lock = Lock()
 
     with tqdm.tqdm(
         total=len(files), desc="Vectorising files...", disable=configs.pipe
@@ -150,13 +256,12 @@ async def vectorise(configs: Config) -> int:
                         configs,
                         max_batch_size,
                         semaphore,
+                        embedding_lock,
                     )
                 )
                 for file in files
             ]
-            for task in asyncio.as_completed(tasks):
-                await task
-                bar.update(1)
+            await wait_with_progress(tasks, bar)
         except asyncio.CancelledError:
             print("Abort.", file=sys.stderr)
             return 1
@@ -172,7 +277,7 @@ async def vectorise(configs: Config) -> int:
             async with stats_lock:
                 stats["removed"] = len(orphanes)
             if len(orphanes):
-                await collection.delete(where={"path": {"$in": list(orphanes)}})
+                await delete_paths(collection, orphanes)
 
     show_stats(configs=configs, stats=stats)
     return 0
@@ -0,0 +1,3 @@
+# Import the heavy dependencies once, before the test modules are collected.
+import chromadb  # noqa: F401
+import httpx  # noqa: F401
@@ -1,25 +1,29 @@
 import json
 import os
 import tempfile
+from dataclasses import fields
 from typing import Any, Dict
 from unittest.mock import patch
 
 import pytest
 
 from vectorcode.cli_utils import (
+    CONFIG_FILE_DEFAULTS,
     CliAction,
     Config,
+    QueryInclude,
     expand_envs_in_dict,
     expand_globs,
     expand_path,
     find_project_config_dir,
+    find_project_root,
+    get_cli_parser,
     load_config_file,
     parse_cli_args,
 )
 
 
-@pytest.mark.asyncio
-async def test_config_import_from():
+def test_config_import_from():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         db_path = os.path.join(temp_dir, "test_db")
         os.makedirs(db_path, exist_ok=True)
@@ -35,8 +39,9 @@ async def test_config_import_from():
             "reranker": "TestReranker",
             "reranker_params": {"reranker_param1": "reranker_value1"},
             "db_settings": {"db_setting1": "db_value1"},
+            "concurrency": 8,
         }
-        config = await Config.import_from(config_dict)
+        config = Config.import_from(config_dict)
         assert config.db_path == db_path
         assert config.host == "test_host"
         assert config.port == 1234
@@ -48,17 +53,25 @@ async def test_config_import_from():
         assert config.reranker == "TestReranker"
         assert config.reranker_params == {"reranker_param1": "reranker_value1"}
         assert config.db_settings == {"db_setting1": "db_value1"}
+        assert config.concurrency == 8
 
 
-@pytest.mark.asyncio
-async def test_config_import_from_invalid_path():
+def test_config_file_defaults_match_config_fields():
+    field_names = {f.name for f in fields(Config)}
+    assert set(CONFIG_FILE_DEFAULTS) <= field_names
+    config = Config.import_from({})
+    for key, default in CONFIG_FILE_DEFAULTS.items():
+        if default is not None:
+            assert getattr(config, key) == default
+
+
+def test_config_import_from_invalid_path():
     config_dict: Dict[str, Any] = {"db_path": "/path/does/not/exist"}
     with pytest.raises(IOError):
-        await Config.import_from(config_dict)
+        Config.import_from(config_dict)
 
 
-@pytest.mark.asyncio
-async def test_config_import_from_db_path_is_file():
+def test_config_import_from_db_path_is_file():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         db_path = os.path.join(temp_dir, "test_db_file")
         with open(db_path, "w") as f:
@@ -66,25 +79,23 @@ async def test_config_import_from_db_path_is_file():
 
         config_dict: Dict[str, Any] = {"db_path": db_path}
         with pytest.raises(IOError):
-            await Config.import_from(config_dict)
+            Config.import_from(config_dict)
 
 
-@pytest.mark.asyncio
-async def test_config_merge_from():
+def test_config_merge_from():
     config1 = Config(host="host1", port=8001, n_result=5)
     config2 = Config(host="host2", port=None, query=["test"])
-    merged_config = await config1.merge_from(config2)
+    merged_config = config1.merge_from(config2)
     assert merged_config.host == "host2"
     assert merged_config.port == 8001  # port from config1 should be retained
     assert merged_config.n_result == 5
     assert merged_config.query == ["test"]
 
 
-@pytest.mark.asyncio
-async def test_config_merge_from_new_fields():
+def test_config_merge_from_new_fields():
     config1 = Config(host="host1", port=8001)
     config2 = Config(query=["test"], n_result=10, recursive=True)
-    merged_config = await config1.merge_from(config2)
+    merged_config = config1.merge_from(config2)
     assert merged_config.host == "host1"
     assert merged_config.port == 8001
     assert merged_config.query == ["test"]
@@ -92,10 +103,9 @@ async def test_config_merge_from_new_fields():
     assert merged_config.recursive
 
 
-@pytest.mark.asyncio
-async def test_config_import_from_missing_keys():
+def test_config_import_from_missing_keys():
     config_dict: Dict[str, Any] = {}  # Empty dictionary, all keys missing
-    config = await Config.import_from(config_dict)
+    config = Config.import_from(config_dict)
 
     # Assert that default values are used
     assert config.embedding_function == "SentenceTransformerEmbeddingFunction"
@@ -109,6 +119,7 @@ async def test_config_import_from_missing_keys():
     assert config.reranker is None
     assert config.reranker_params == {}
     assert config.db_settings is None
+    assert config.concurrency == 0
 
 
 def test_expand_envs_in_dict():
@@ -129,8 +140,7 @@ def test_expand_envs_in_dict():
     del os.environ["TEST_VAR"]  # Clean up the env
 
 
-@pytest.mark.asyncio
-async def test_expand_globs():
+def test_expand_globs():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         file1_path = os.path.join(temp_dir, "file1.txt")
         dir1_path = os.path.join(temp_dir, "dir1")
@@ -149,21 +159,61 @@ async def test_expand_globs():
             f.write("content")
 
         paths = [file1_path, dir1_path]
-        expanded_paths = await expand_globs(paths, recursive=True)
+        expanded_paths = expand_globs(paths, recursive=True)
         assert len(expanded_paths) == 2
         assert file1_path in expanded_paths
         assert file2_path in expanded_paths
 
         paths = [os.path.join(temp_dir, "*.txt")]
-        expanded_paths = await expand_globs(paths, recursive=False)
+        expanded_paths = expand_globs(paths, recursive=False)
         assert len(expanded_paths) == 1  # Expecting 1 file in the temp_dir
 
         paths = [dir1_path]
-        expanded_paths = await expand_globs(paths, recursive=True)
+        expanded_paths = expand_globs(paths, recursive=True)
         assert len(expanded_paths) == 1
         assert file2_path in expanded_paths
 
 
+def test_expand_globs_skips_hidden():
+    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
+        visible_file = os.path.join(temp_dir, "dir1", "file.txt")
+        hidden_file = os.path.join(temp_dir, ".hidden_file.txt")
+        hidden_dir_file = os.path.join(temp_dir, ".git", "config")
+        for path in (visible_file, hidden_file, hidden_dir_file):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("content")
+
+        expanded_paths = expand_globs([temp_dir], recursive=True)
+        assert expanded_paths == [visible_file]
+
+
+def test_expand_globs_recursive_pattern():
+    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
+        py_file = os.path.join(temp_dir, "file1.py")
+        nested_py_file = os.path.join(temp_dir, "dir1", "dir2", "file2.py")
+        txt_file = os.path.join(temp_dir, "dir1", "file3.txt")
+        hidden_py_file = os.path.join(temp_dir, ".venv", "file4.py")
+        for path in (py_file, nested_py_file, txt_file, hidden_py_file):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("content")
+
+        pattern = os.path.join(temp_dir, "**", "*.py")
+        expanded_paths = expand_globs([pattern], recursive=True)
+        assert sorted(expanded_paths) == sorted([py_file, nested_py_file])
+
+        # `**` only matches a single level when not recursive.
+        expanded_paths = expand_globs([pattern], recursive=False)
+        assert expanded_paths == []
+
+        # a trailing separator only matches directories.
+        dir_pattern = os.path.join(temp_dir, "*", "")
+        assert expand_globs([dir_pattern], recursive=False) == []
+        expanded_paths = expand_globs([dir_pattern], recursive=True)
+        assert sorted(expanded_paths) == sorted([nested_py_file, txt_file])
+
+
 def test_expand_path():
     path_with_user = "~/test_dir"
     expanded_path = expand_path(path_with_user)
@@ -187,43 +237,55 @@ def test_expand_path():
     assert expanded_path == os.path.abspath(os.path.expanduser(abs_path))
 
 
-@pytest.mark.asyncio
-async def test_load_config_file_invalid_json():
+def test_load_config_file_invalid_json():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         config_path = os.path.join(temp_dir, "config.json")
         with open(config_path, "w") as f:
             f.write("invalid json")
 
         with pytest.raises(json.JSONDecodeError):
-            await load_config_file(config_path)
+            load_config_file(config_path)
+
 
+def test_load_config_file_cache():
+    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
+        config_path = os.path.join(temp_dir, "config.json")
+        with open(config_path, "w") as f:
+            json.dump({"chunk_size": 512, "embedding_params": {"key": "value"}}, f)
+
+        config = load_config_file(config_path)
+        assert config.chunk_size == 512
+        # Mutating the loaded config shouldn't leak into the cached content.
+        config.embedding_params["key"] = "modified"
+        assert load_config_file(config_path).embedding_params == {"key": "value"}
 
-@pytest.mark.asyncio
-async def test_find_project_config_dir_no_anchors():
+        with open(config_path, "w") as f:
+            json.dump({"chunk_size": 2048}, f)
+        assert load_config_file(config_path).chunk_size == 2048
+
+
+def test_find_project_config_dir_no_anchors():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
-        project_dir = await find_project_config_dir(temp_dir)
+        project_dir = find_project_config_dir(temp_dir)
         assert project_dir is None
 
 
-@pytest.mark.asyncio
-async def test_expand_globs_nonexistent_path():
-    expanded_paths = await expand_globs(["/path/does/not/exist"])
+def test_expand_globs_nonexistent_path():
+    expanded_paths = expand_globs(["/path/does/not/exist"])
     assert len(expanded_paths) == 0
 
 
-@pytest.mark.asyncio
-async def test_load_config_file_empty_file():
+def test_load_config_file_empty_file():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         config_path = os.path.join(temp_dir, "config.json")
         with open(config_path, "w") as f:
             f.write("")
 
         with pytest.raises(json.JSONDecodeError):
-            await load_config_file(config_path)
+            load_config_file(config_path)
 
 
-@pytest.mark.asyncio
-async def test_find_project_config_dir_nested():
+def test_find_project_config_dir_nested():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         level1_dir = os.path.join(temp_dir, "level1")
         level2_dir = os.path.join(level1_dir, "level2")
@@ -239,38 +301,103 @@ async def test_find_project_config_dir_nested():
         os.makedirs(git_dir)
 
         # Test finding from level3_dir; should find .vectorcode in level2
-        found_dir = await find_project_config_dir(level3_dir)
+        found_dir = find_project_config_dir(level3_dir)
         assert found_dir == vectorcode_dir
 
         # Test finding from level2_dir; should find .vectorcode in level2
-        found_dir = await find_project_config_dir(level2_dir)
+        found_dir = find_project_config_dir(level2_dir)
         assert found_dir == vectorcode_dir
 
         # Test finding from level1_dir; should find .git in level1
-        found_dir = await find_project_config_dir(level1_dir)
+        found_dir = find_project_config_dir(level1_dir)
         assert found_dir == git_dir
 
 
-@pytest.mark.asyncio
-async def test_expand_globs_mixed_paths():
+def test_find_project_config_dir_new_anchor():
+    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
+        project_dir = os.path.join(temp_dir, "project")
+        git_dir = os.path.join(temp_dir, ".git")
+        os.makedirs(project_dir)
+        os.makedirs(git_dir)
+        assert find_project_config_dir(project_dir) == git_dir
+
+        # a higher-priority anchor created later should be picked up.
+        vectorcode_dir = os.path.join(project_dir, ".vectorcode")
+        os.makedirs(vectorcode_dir)
+        assert find_project_config_dir(project_dir) == vectorcode_dir
+
+
+def test_find_project_root():
+    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
+        project_root = os.path.join(temp_dir, "project")
+        nested_dir = os.path.join(project_root, "src", "pkg")
+        os.makedirs(nested_dir)
+        os.makedirs(os.path.join(project_root, ".vectorcode"))
+        nested_file = os.path.join(nested_dir, "module.py")
+        with open(nested_file, "w") as f:
+            f.write("content")
+
+        assert find_project_root(nested_dir) == project_root
+        assert find_project_root(nested_file) == project_root
+        assert find_project_root(project_root) == project_root
+        assert find_project_root(temp_dir) is None
+
+
+def test_expand_globs_mixed_paths():
     with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
         existing_file = os.path.join(temp_dir, "existing_file.txt")
         with open(existing_file, "w") as f:
             f.write("content")
 
         paths = [existing_file, "/path/does/not/exist"]
-        expanded_paths = await expand_globs(paths)
+        expanded_paths = expand_globs(paths)
         assert len(expanded_paths) == 1
         assert existing_file in expanded_paths
 
 
-@pytest.mark.asyncio
-async def test_cli_arg_parser():
+def test_cli_arg_parser():
     with patch(
         "sys.argv", ["vectorcode", "query", "test_query", "-n", "5", "--absolute"]
     ):
-        config = await parse_cli_args()
+        config = parse_cli_args()
         assert config.action == CliAction.query
         assert config.query == ["test_query"]
         assert config.n_result == 5
         assert config.use_absolute_path
+
+
+def test_get_cli_parser_is_cached():
+    assert get_cli_parser() is get_cli_parser()
+
+
+def test_print_completion(capsys):
+    assert "--print-completion" in get_cli_parser().format_help()
+    with pytest.raises(SystemExit) as e:
+        parse_cli_args(["--print-comp", "bash"])
+    assert e.value.code == 0
+    script = capsys.readouterr().out
+    assert "_shtab_compgen_dirs" in script
+    assert "_shtab_compgen_files" in script
+
+
+def test_cli_arg_parser_vectorise():
+    config = parse_cli_args(["vectorise", "file1.py", "file2.py", "-r", "-c", "100"])
+    assert config.action == CliAction.vectorise
+    assert config.files == ["file1.py", "file2.py"]
+    assert config.recursive
+    assert config.chunk_size == 100
+    # fields of other subcommands keep their defaults.
+    assert config.query is None
+    assert config.check_item is None
+
+
+def test_cli_arg_parser_check():
+    config = parse_cli_args(["check", "config"])
+    assert config.action == CliAction.check
+    assert config.check_item == "config"
+    assert config.files == []
+
+
+def test_query_include_to_header():
+    assert QueryInclude.path.to_header() == "Path: "
+    assert QueryInclude.document.to_header() == "Document:\n"
@@ -1,17 +1,19 @@
+import asyncio
 import os
-import socket
 import subprocess
 import sys
-import tempfile
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import httpx
 import pytest
 from chromadb.api import AsyncClientAPI
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 
 from vectorcode.cli_utils import Config
 from vectorcode.common import (
+    _build_ef,
+    _hash_collection_path,
     get_client,
     get_collection,
     get_collection_name,
@@ -23,106 +25,139 @@ from vectorcode.common import (
 )
 
 
-def test_get_collection_name():
-    with tempfile.TemporaryDirectory(dir="/tmp") as temp_dir:
-        file_path = os.path.join(temp_dir, "test_file.txt")
-        collection_name = get_collection_name(file_path)
-        assert isinstance(collection_name, str)
-        assert len(collection_name) == 63
+@pytest.fixture(scope="session")
+def shared_tmp(tmp_path_factory):
+    return tmp_path_factory.mktemp("vc_tests")
 
-        # Test that the collection name is consistent for the same path
-        collection_name2 = get_collection_name(file_path)
-        assert collection_name == collection_name2
-
-        # Test that the collection name is different for different paths
-        file_path2 = os.path.join(temp_dir, "another_file.txt")
-        collection_name2 = get_collection_name(file_path2)
-        assert collection_name != collection_name2
-
-        # Test with absolute path
-        abs_file_path = os.path.abspath(file_path)
-        collection_name3 = get_collection_name(abs_file_path)
-        assert collection_name == collection_name3
 
+@pytest.fixture
+def make_config():
+    def _make_config(**overrides) -> Config:
+        return Config(
+            **{"host": "test_host", "port": 1234, "db_path": "test_db", **overrides}
+        )
 
-def test_get_embedding_function():
-    # Test with a valid embedding function
+    return _make_config
+
+
+def test_get_collection_name(shared_tmp):
+    _hash_collection_path.cache_clear()
+    temp_dir = str(shared_tmp)
+    file_path = os.path.join(temp_dir, "test_file.txt")
+    collection_name = get_collection_name(file_path)
+    assert isinstance(collection_name, str)
+    assert len(collection_name) == 63
+
+    # Test that the collection name is consistent for the same path
+    collection_name2 = get_collection_name(file_path)
+    assert collection_name == collection_name2
+    assert _hash_collection_path.cache_info().hits >= 1
+
+    # Test that the collection name is different for different paths
+    file_path2 = os.path.join(temp_dir, "another_file.txt")
+    collection_name2 = get_collection_name(file_path2)
+    assert collection_name != collection_name2
+
+    # Test with absolute path
+    abs_file_path = os.path.abspath(file_path)
+    collection_name3 = get_collection_name(abs_file_path)
+    assert collection_name == collection_name3
+
+
+@pytest.fixture
+def mock_st_ef():
+    # avoid loading the actual model. The cache is cleared so that the mock is
+    # neither shadowed by, nor leaked to, other tests.
+    real_class = embedding_functions.SentenceTransformerEmbeddingFunction
+    _build_ef.cache_clear()
+    with patch.object(
+        embedding_functions, "SentenceTransformerEmbeddingFunction"
+    ) as mock_class:
+        mock_class.return_value = MagicMock(spec=real_class)
+        yield real_class
+    _build_ef.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "embedding_function, embedding_params",
+    [
+        # Test with a valid embedding function
+        ("SentenceTransformerEmbeddingFunction", {}),
+        # Test with an invalid embedding function (fallback to SentenceTransformer)
+        ("FakeEmbeddingFunction", {}),
+        # Test with specific embedding parameters
+        ("SentenceTransformerEmbeddingFunction", {"param1": "value1"}),
+    ],
+)
+def test_get_embedding_function(mock_st_ef, embedding_function, embedding_params):
     config = Config(
-        embedding_function="SentenceTransformerEmbeddingFunction", embedding_params={}
+        embedding_function=embedding_function, embedding_params=embedding_params
     )
     embedding_function = get_embedding_function(config)
-    assert "SentenceTransformerEmbeddingFunction" in str(type(embedding_function))
+    assert isinstance(embedding_function, mock_st_ef)
 
-    # Test with an invalid embedding function (fallback to SentenceTransformer)
-    config = Config(embedding_function="FakeEmbeddingFunction", embedding_params={})
-    embedding_function = get_embedding_function(config)
-    assert "SentenceTransformerEmbeddingFunction" in str(type(embedding_function))
 
-    # Test with specific embedding parameters
-    config = Config(
-        embedding_function="SentenceTransformerEmbeddingFunction",
-        embedding_params={"param1": "value1"},
+def test_get_embedding_function_cached(mock_st_ef):
+    # a new instance per construction, so that the identity checks are meaningful.
+    embedding_functions.SentenceTransformerEmbeddingFunction.side_effect = (
+        lambda **kwargs: MagicMock(spec=mock_st_ef)
     )
-    embedding_function = get_embedding_function(config)
-    assert "SentenceTransformerEmbeddingFunction" in str(type(embedding_function))
-
-
-@pytest.mark.asyncio
-async def test_try_server():
-    # This test requires a server to be running, so it's difficult to make it truly isolated.
-    # For now, let's just check that it returns False when the server is not running on a common port.
-    assert not await try_server("localhost", 9999)
+    default = Config(embedding_function="SentenceTransformerEmbeddingFunction")
+    ef = get_embedding_function(default)
+    assert get_embedding_function(default) is ef
+    assert (
+        get_embedding_function(
+            Config(
+                embedding_function="SentenceTransformerEmbeddingFunction",
+                embedding_params={"param1": "value1"},
+            )
+        )
+        is not ef
+    )
+    # the fallback goes through the same cache as the default config.
+    assert get_embedding_function(Config(embedding_function="FakeEF")) is ef
+    assert embedding_functions.SentenceTransformerEmbeddingFunction.call_count == 2
 
 
-@pytest.mark.asyncio
+@pytest.mark.asyncio(loop_scope="session")
 async def test_wait_for_server_timeout():
-    with pytest.raises(TimeoutError):
-        await wait_for_server("localhost", 9999, timeout=1)
+    with (
+        patch(
+            "asyncio.open_connection",
+            new=AsyncMock(side_effect=ConnectionRefusedError()),
+        ),
+        patch("asyncio.sleep", new=AsyncMock()),
+        pytest.raises(TimeoutError),
+    ):
+        await wait_for_server("localhost", 9999, timeout=0)
 
 
-@pytest.mark.asyncio
-async def test_get_client():
+@pytest.mark.parametrize(
+    "db_settings, expected_telemetry",
+    [
+        (None, False),
+        # Test with valid db_settings (only anonymized_telemetry)
+        ({"anonymized_telemetry": True}, True),
+        # Test with multiple db_settings, including an invalid one.  The invalid one
+        # should be filtered out inside get_client.
+        ({"anonymized_telemetry": True, "other_setting": "value"}, True),
+    ],
+)
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_client(make_config, db_settings, expected_telemetry):
     # Patch chromadb.AsyncHttpClient to avoid actual network calls
     with patch("chromadb.AsyncHttpClient") as MockAsyncHttpClient:
-        mock_client = MagicMock(spec=AsyncClientAPI)
+        mock_client = AsyncMock(spec=AsyncClientAPI)
         MockAsyncHttpClient.return_value = mock_client
 
-        config = Config(host="test_host", port=1234, db_path="test_db")
+        config = make_config(db_settings=db_settings)
         client = await get_client(config)
 
         assert isinstance(client, AsyncClientAPI)
         MockAsyncHttpClient.assert_called_once_with(
-            host="test_host", port=1234, settings=Settings(anonymized_telemetry=False)
-        )
-
-        # Test with valid db_settings (only anonymized_telemetry)
-        config = Config(
             host="test_host",
             port=1234,
-            db_path="test_db",
-            db_settings={"anonymized_telemetry": True},
-        )
-        client = await get_client(config)
-
-        assert isinstance(client, AsyncClientAPI)
-        MockAsyncHttpClient.assert_called_with(
-            host="test_host", port=1234, settings=Settings(anonymized_telemetry=True)
-        )
-
-        # Test with multiple db_settings, including an invalid one.  The invalid one
-        # should be filtered out inside get_client.
-        config = Config(
-            host="test_host",
-            port=1234,
-            db_path="test_db",
-            db_settings={"anonymized_telemetry": True, "other_setting": "value"},
-        )
-        client = await get_client(config)
-        assert isinstance(client, AsyncClientAPI)
-        MockAsyncHttpClient.assert_called_with(
-            host="test_host",
-            port=1234,
-            settings=Settings(anonymized_telemetry=True),
+            settings=Settings(anonymized_telemetry=expected_telemetry),
         )
 
 
@@ -159,47 +194,49 @@ def test_verify_ef():
     assert verify_ef(mock_collection, mock_config) is True
 
 
-@patch("socket.socket")
-@pytest.mark.asyncio
-async def test_try_server_mocked(mock_socket):
-    # Mocking httpx.AsyncClient and its get method to simulate a successful connection
-    with patch("httpx.AsyncClient") as mock_client:
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_client.return_value.__aenter__.return_value.get.return_value = (
-            mock_response
+@pytest.mark.parametrize(
+    "get_result, expected",
+    [
+        # simulate a successful connection
+        (MagicMock(status_code=200), True),
+        (httpx.ConnectError("Simulated connection error"), False),
+        (httpx.ConnectTimeout("Simulated connection timeout"), False),
+        (OSError("connection refused"), False),
+    ],
+)
+@pytest.mark.asyncio(loop_scope="session")
+async def test_try_server_mocked(get_result, expected):
+    # Mocking the shared heartbeat client. Exceptions in `side_effect` are raised.
+    with patch("vectorcode.common._get_http_client") as mock_client:
+        mock_client.return_value.get = AsyncMock(side_effect=[get_result])
+        assert await try_server("localhost", 8000) is expected
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_try_server_timeout():
+    # only the connection is bounded, so that a slow but reachable server isn't
+    # treated as unavailable.
+    with patch("vectorcode.common._get_http_client") as mock_client:
+        mock_client.return_value.get = AsyncMock(
+            return_value=MagicMock(status_code=200)
         )
         assert await try_server("localhost", 8000) is True
+    timeout = mock_client.return_value.get.call_args.kwargs["timeout"]
+    assert timeout.connect == 0.5
+    assert timeout.read > 0.5
 
-    # Mocking httpx.AsyncClient to raise a ConnectError
-    with patch("httpx.AsyncClient") as mock_client:
-        mock_client.return_value.__aenter__.return_value.get.side_effect = (
-            httpx.ConnectError("Simulated connection error")
-        )
-        assert await try_server("localhost", 8000) is False
 
-    # Mocking httpx.AsyncClient to raise a ConnectTimeout
-    with patch("httpx.AsyncClient") as mock_client:
-        mock_client.return_value.__aenter__.return_value.get.side_effect = (
-            httpx.ConnectTimeout("Simulated connection timeout")
-        )
-        assert await try_server("localhost", 8000) is False
-
-
-@pytest.mark.asyncio
-async def test_get_collection():
-    config = Config(
-        host="test_host",
-        port=1234,
-        db_path="test_db",
+@pytest.mark.asyncio(loop_scope="session")
+async def test_get_collection(make_config, mock_st_ef):
+    config = make_config(
         embedding_function="SentenceTransformerEmbeddingFunction",
         embedding_params={},
         project_root="/test_project",
     )
 
-    # Test retrieving an existing collection
     with patch("chromadb.AsyncHttpClient") as MockAsyncHttpClient:
-        mock_client = MagicMock(spec=AsyncClientAPI)
+        # Test retrieving an existing collection
+        mock_client = AsyncMock(spec=AsyncClientAPI)
         mock_collection = MagicMock()
         mock_client.get_collection.return_value = mock_collection
         MockAsyncHttpClient.return_value = mock_client
@@ -209,35 +246,31 @@ async def test_get_collection():
         mock_client.get_collection.assert_called_once()
         mock_client.get_or_create_collection.assert_not_called()
 
-    # Test creating a collection if it doesn't exist
-    with patch("chromadb.AsyncHttpClient") as MockAsyncHttpClient:
-        mock_client = MagicMock(spec=AsyncClientAPI)
+        # Test creating a collection if it doesn't exist
+        mock_client = AsyncMock(spec=AsyncClientAPI)
         mock_collection = MagicMock()
-        mock_collection.metadata = {
-            "hostname": socket.gethostname(),
-            "username": os.environ.get(
-                "USER", os.environ.get("USERNAME", "DEFAULT_USER")
-            ),
-            "created-by": "VectorCode",
-        }
-        mock_client.get_or_create_collection.return_value = mock_collection
+
+        def create_collection(name, metadata, embedding_function):
+            # a new collection carries the metadata that get_collection passed in.
+            mock_collection.metadata = metadata
+            return mock_collection
+
+        mock_client.get_or_create_collection.side_effect = create_collection
         MockAsyncHttpClient.return_value = mock_client
 
         collection = await get_collection(mock_client, config, make_if_missing=True)
         assert collection == mock_collection
         mock_client.get_or_create_collection.assert_called_once()
 
-    # Test raising ValueError if collection doesn't exist and make_if_missing is False
-    with patch("chromadb.AsyncHttpClient") as MockAsyncHttpClient:
-        mock_client = MagicMock(spec=AsyncClientAPI)
+        # Test raising ValueError if collection doesn't exist and make_if_missing is False
+        mock_client = AsyncMock(spec=AsyncClientAPI)
         mock_client.get_collection.side_effect = ValueError("Collection not found")
         MockAsyncHttpClient.return_value = mock_client
         with pytest.raises(ValueError):
             await get_collection(mock_client, config, make_if_missing=False)
 
-    # Test raising IndexError on hash collision.
-    with patch("chromadb.AsyncHttpClient") as MockAsyncHttpClient:
-        mock_client = MagicMock(spec=AsyncClientAPI)
+        # Test raising IndexError on hash collision.
+        mock_client = AsyncMock(spec=AsyncClientAPI)
         mock_client.get_or_create_collection.side_effect = IndexError(
             "Hash collision occurred"
         )
@@ -246,14 +279,46 @@ async def test_get_collection():
             await get_collection(mock_client, config, make_if_missing=True)
 
 
-@pytest.mark.asyncio
-async def test_start_server():
+@pytest.fixture
+def mock_free_port():
+    with patch("socket.socket") as MockSocket:
+        mock_socket = MockSocket.return_value.__enter__.return_value
+        mock_socket.getsockname.return_value = ("localhost", 12345)
+        yield 12345
+
+
+async def _wait_forever(*args, **kwargs):
+    await asyncio.Event().wait()
+
+
+# arguments passed to `sys.executable` when starting the chromadb server.
+EXPECTED_ARGV_TEMPLATE = (
+    "-m",
+    "chromadb.cli.cli",
+    "run",
+    "--host",
+    "localhost",
+    "--port",
+    "{port}",
+    "--path",
+    "{path}",
+    "--log-path",
+    "{log}",
+)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_start_server(shared_tmp, make_config):
     # Mock subprocess.Popen
     with (
-        patch("asyncio.create_subprocess_exec") as MockCreateProcess,
+        patch(
+            "asyncio.create_subprocess_exec", new_callable=AsyncMock
+        ) as MockCreateProcess,
         patch("asyncio.sleep"),
         patch("socket.socket") as MockSocket,
-        patch("vectorcode.common.wait_for_server") as MockWaitForServer,
+        patch(
+            "vectorcode.common.wait_for_server", new_callable=AsyncMock
+        ) as MockWaitForServer,
     ):
         # Mock socket to return a specific port
         mock_socket = MagicMock()
@@ -261,47 +326,103 @@ async def test_start_server():
         MockSocket.return_value.__enter__.return_value = mock_socket
 
         # Mock the process object
-        mock_process = MagicMock()
-        mock_process.returncode = 0  # Simulate successful execution
+        mock_process = AsyncMock(
+            spec=asyncio.subprocess.Process,
+            returncode=0,  # Simulate successful execution
+        )
+        # the server keeps running.
+        mock_process.wait.side_effect = _wait_forever
         MockCreateProcess.return_value = mock_process
 
         # Create a config object
-        with tempfile.TemporaryDirectory() as temp_dir:
-            config = Config(
-                host="localhost",
-                port=8000,
-                db_path=temp_dir,
-                project_root=temp_dir,
+        temp_dir = str(shared_tmp)
+        config = make_config(
+            host="localhost",
+            port=8000,
+            db_path=temp_dir,
+            project_root=temp_dir,
+        )
+
+        # Call start_server
+        process = await start_server(config)
+
+        # Assert that asyncio.create_subprocess_exec was called with the correct arguments
+        MockCreateProcess.assert_called_once()
+        args, kwargs = MockCreateProcess.call_args
+        assert args[0] == sys.executable
+        assert args[1:] == tuple(
+            arg.format(
+                port=12345,  # Check the mocked port
+                path=temp_dir,
+                log=os.path.join(temp_dir, "chroma.log"),
             )
+            for arg in EXPECTED_ARGV_TEMPLATE
+        )
+        assert kwargs["stdout"] == subprocess.DEVNULL
+        assert kwargs["stderr"] == sys.stderr
+        assert "ANONYMIZED_TELEMETRY" in kwargs["env"]
+
+        # Assert that wait_for_server was called with the correct arguments
+        MockWaitForServer.assert_called_once_with("localhost", 12345)
+
+        # Assert that the function returns the process
+        assert process == mock_process
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_start_server_retries_when_server_exits(
+    shared_tmp, make_config, mock_free_port
+):
+    # the first server exits right away (e.g. its port was taken), the second one
+    # becomes ready.
+    exited_process = AsyncMock(spec=asyncio.subprocess.Process, returncode=1)
+    running_process = AsyncMock(spec=asyncio.subprocess.Process, returncode=None)
+    running_process.wait.side_effect = _wait_forever
+    becomes_ready = iter([False, True])
+
+    async def fake_wait_for_server(host, port):
+        if not next(becomes_ready):
+            await _wait_forever()
+
+    with (
+        patch(
+            "asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            side_effect=[exited_process, running_process],
+        ) as MockCreateProcess,
+        patch("vectorcode.common.wait_for_server", side_effect=fake_wait_for_server),
+    ):
+        config = make_config(db_path=str(shared_tmp), project_root=str(shared_tmp))
+        process = await start_server(config)
+
+    assert process is running_process
+    assert MockCreateProcess.call_count == 2
+    exited_process.terminate.assert_not_called()
+
+
+@pytest.mark.parametrize("error", [TimeoutError, httpx.HTTPError, RuntimeError])
+@pytest.mark.asyncio(loop_scope="session")
+async def test_start_server_error(shared_tmp, make_config, mock_free_port, error):
+    running_process = AsyncMock(spec=asyncio.subprocess.Process, returncode=None)
+    running_process.wait.side_effect = _wait_forever
+    # the process exits once it's terminated.
+    running_process.terminate.side_effect = lambda: setattr(
+        running_process.wait, "side_effect", None
+    )
+    with (
+        patch(
+            "asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            return_value=running_process,
+        ),
+        patch(
+            "vectorcode.common.wait_for_server",
+            new_callable=AsyncMock,
+            side_effect=error("failed"),
+        ),
+    ):
+        config = make_config(db_path=str(shared_tmp), project_root=str(shared_tmp))
+        with pytest.raises(error):
+            await start_server(config)
 
-            # Call start_server
-            process = await start_server(config)
-
-            # Assert that asyncio.create_subprocess_exec was called with the correct arguments
-            MockCreateProcess.assert_called_once()
-            args, kwargs = MockCreateProcess.call_args
-            expected_args = [
-                sys.executable,
-                "-m",
-                "chromadb.cli.cli",
-                "run",
-                "--host",
-                "localhost",
-                "--port",
-                str(12345),  # Check the mocked port
-                "--path",
-                temp_dir,
-                "--log-path",
-                os.path.join(temp_dir, "chroma.log"),
-            ]
-            assert args[0] == sys.executable
-            assert tuple(args[1:]) == tuple(expected_args[1:])
-            assert kwargs["stdout"] == subprocess.DEVNULL
-            assert kwargs["stderr"] == sys.stderr
-            assert "ANONYMIZED_TELEMETRY" in kwargs["env"]
-
-            # Assert that wait_for_server was called with the correct arguments
-            MockWaitForServer.assert_called_once_with("localhost", 12345)
-
-            # Assert that the function returns the process
-            assert process == mock_process
+    running_process.terminate.assert_called_once()
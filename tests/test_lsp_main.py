@@ -0,0 +1,50 @@
+import json
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+pytest.importorskip("pygls")
+
+from vectorcode import lsp_main  # noqa: E402
+from vectorcode.cli_utils import Config  # noqa: E402
+
+
+@pytest.fixture
+def mock_server():
+    with (
+        patch("vectorcode.lsp_main.try_server", AsyncMock(return_value=True)),
+        patch("vectorcode.lsp_main.get_client", AsyncMock()),
+        patch("vectorcode.lsp_main.get_collection", AsyncMock()),
+        patch.dict(lsp_main.cached_project_configs, clear=True),
+        patch.dict(lsp_main.cached_clients, clear=True),
+        patch.dict(lsp_main.cached_collections, clear=True),
+    ):
+        yield
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_make_caches_project_config(tmp_path, mock_server):
+    project_root = str(tmp_path)
+    os.makedirs(os.path.join(project_root, ".vectorcode"))
+    with open(os.path.join(project_root, ".vectorcode", "config.json"), "w") as fin:
+        json.dump({"chunk_size": 1234}, fin)
+
+    await lsp_main.make_caches(project_root)
+
+    config = lsp_main.cached_project_configs[project_root]
+    assert config.chunk_size == 1234
+    assert config.project_root == project_root
+    assert project_root in lsp_main.cached_collections
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_make_caches_global_config(tmp_path, mock_server):
+    project_root = str(tmp_path)
+    with patch(
+        "vectorcode.lsp_main.load_config_file", return_value=Config(chunk_size=4321)
+    ) as mock_load_config_file:
+        await lsp_main.make_caches(project_root)
+
+    mock_load_config_file.assert_called_once_with(None)
+    assert lsp_main.cached_project_configs[project_root].chunk_size == 4321
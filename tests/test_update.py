@@ -0,0 +1,153 @@
+import json
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from vectorcode.cli_utils import Config
+from vectorcode.subcommands.update import split_existing_files, update
+from vectorcode.subcommands.vectorise import hash_chunking_params, hash_file
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_split_existing_files(tmp_path):
+    existing_file = tmp_path / "existing.py"
+    existing_file.write_text("print('hello')")
+    sub_dir = tmp_path / "sub_dir"
+    sub_dir.mkdir()
+    unreadable_dir = tmp_path / "unreadable"
+    unreadable_dir.mkdir()
+    unreadable_file = unreadable_dir / "file.py"
+    unreadable_file.write_text("")
+
+    paths = [
+        str(existing_file),
+        str(tmp_path / "missing.py"),
+        str(sub_dir),
+        str(tmp_path / "missing_dir" / "file.py"),
+        str(unreadable_file),
+        str(unreadable_dir / "missing.py"),
+    ]
+    scandir = os.scandir
+
+    def fake_scandir(path):
+        if path == str(unreadable_dir):
+            raise PermissionError(path)
+        return scandir(path)
+
+    with patch("os.scandir", side_effect=fake_scandir):
+        files, orphanes = await split_existing_files(paths)
+
+    assert files == {str(existing_file), str(unreadable_file)}
+    assert orphanes == {
+        str(tmp_path / "missing.py"),
+        str(sub_dir),
+        str(tmp_path / "missing_dir" / "file.py"),
+        str(unreadable_dir / "missing.py"),
+    }
+
+
+@pytest.fixture
+def mock_collection():
+    collection = AsyncMock()
+    client = AsyncMock()
+    client.get_max_batch_size = AsyncMock(return_value=100)
+    with (
+        patch(
+            "vectorcode.subcommands.update.get_client",
+            AsyncMock(return_value=client),
+        ),
+        patch("vectorcode.subcommands.update.get_collection", return_value=collection),
+        patch("vectorcode.subcommands.update.verify_ef", return_value=True),
+    ):
+        yield collection
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_update_skips_unchanged_files(tmp_path, mock_collection):
+    configs = Config(project_root=str(tmp_path), pipe=True, chunk_size=100)
+    contents = {
+        name: f"content of {name}"
+        for name in ("unchanged", "changed", "no_hash", "new_params")
+    }
+    paths = {name: str(tmp_path / f"{name}.py") for name in contents}
+    for name, path in paths.items():
+        with open(path, "w") as fin:
+            fin.write(contents[name])
+    file_hashes = {name: hash_file(path) for name, path in paths.items()}
+    chunking_params = hash_chunking_params(configs)
+
+    mock_collection.get.return_value = {
+        "metadatas": [
+            {
+                "path": paths["unchanged"],
+                "sha256": file_hashes["unchanged"],
+                "chunking_params": chunking_params,
+            },
+            {
+                "path": paths["changed"],
+                "sha256": "outdated hash",
+                "chunking_params": chunking_params,
+            },
+            {"path": paths["no_hash"]},
+            {
+                "path": paths["new_params"],
+                "sha256": file_hashes["new_params"],
+                "chunking_params": hash_chunking_params(Config(chunk_size=200)),
+            },
+        ]
+    }
+
+    with (
+        patch("vectorcode.subcommands.update.chunked_add") as mock_chunked_add,
+        patch("vectorcode.subcommands.update.show_stats") as mock_show_stats,
+    ):
+        assert await update(configs) == 0
+
+    # the hash computed by update is passed to chunked_add instead of recomputed.
+    embedded = {call.args[0]: call.args[-1] for call in mock_chunked_add.call_args_list}
+    assert embedded == {
+        paths[name]: file_hashes[name] for name in ("changed", "no_hash", "new_params")
+    }
+    assert mock_show_stats.call_args.args[1]["skipped"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_update_empty_collection(tmp_path, mock_collection, capsys):
+    mock_collection.get.return_value = {"metadatas": []}
+    configs = Config(project_root=str(tmp_path), pipe=True)
+
+    assert await update(configs) == 0
+
+    assert json.loads(capsys.readouterr().out) == {
+        "add": 0,
+        "update": 0,
+        "removed": 0,
+        "skipped": 0,
+    }
+
+
+@pytest.mark.parametrize("num_chunks", [3, 4])
+@pytest.mark.asyncio(loop_scope="session")
+async def test_update_metadata_pages(tmp_path, mock_collection, num_chunks):
+    metas = [{"path": str(tmp_path / f"file_{idx}.py")} for idx in range(num_chunks)]
+
+    async def fake_get(include, limit, offset):
+        return {"metadatas": metas[offset : offset + limit]}
+
+    mock_collection.get.side_effect = fake_get
+    configs = Config(project_root=str(tmp_path), pipe=True)
+
+    with (
+        patch("vectorcode.subcommands.update.METADATA_PAGE_SIZE", 2),
+        patch("vectorcode.subcommands.update.delete_paths") as mock_delete_paths,
+        patch("vectorcode.subcommands.update.show_stats"),
+    ):
+        assert await update(configs) == 0
+
+    # a full last page needs one more request to find out that it's the last.
+    assert [call.kwargs["offset"] for call in mock_collection.get.call_args_list] == (
+        [0, 2] if num_chunks == 3 else [0, 2, 4]
+    )
+    # none of the files exist, so all the fetched paths are removed.
+    assert mock_delete_paths.call_args.args[1] == {meta["path"] for meta in metas}
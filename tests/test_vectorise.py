@@ -0,0 +1,123 @@
+import asyncio
+import threading
+from asyncio import Lock
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from vectorcode.cli_utils import Config
+from vectorcode.subcommands.vectorise import (
+    chunked_add,
+    delete_paths,
+    hash_chunking_params,
+    hash_file,
+)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_chunked_add_embedding_batches(tmp_path):
+    file_path = tmp_path / "file.py"
+    file_path.write_text("0123456789" * 5 + "01234")
+    configs = Config(project_root=str(tmp_path), chunk_size=10, overlap_ratio=0)
+    collection = AsyncMock()
+    collection.get.return_value = {"ids": []}
+    stats = {"add": 0, "update": 0, "removed": 0, "skipped": 0}
+
+    with patch(
+        "vectorcode.subcommands.vectorise.get_embedding_function",
+        # each embedding holds its document, so that misaligned slices are caught.
+        return_value=lambda documents: [[document] for document in documents],
+    ):
+        await chunked_add(
+            str(file_path),
+            collection,
+            Lock(),
+            stats,
+            Lock(),
+            configs,
+            2,
+            asyncio.Semaphore(4),
+            Lock(),
+        )
+
+    # 6 chunks and the relative path, in batches of 2.
+    assert collection.add.call_count == 4
+    documents = []
+    for call in collection.add.call_args_list:
+        assert len(call.kwargs["documents"]) <= 2
+        assert call.kwargs["embeddings"] == [[doc] for doc in call.kwargs["documents"]]
+        assert call.kwargs["metadatas"] == [
+            {
+                "path": str(file_path),
+                "sha256": hash_file(str(file_path)),
+                "chunking_params": hash_chunking_params(configs),
+            }
+        ] * len(call.kwargs["documents"])
+        documents.extend(call.kwargs["documents"])
+    assert documents == ["0123456789"] * 5 + ["01234", "file.py"]
+    assert stats["add"] == 1
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_chunked_add_embeds_one_file_at_a_time(tmp_path):
+    configs = Config(project_root=str(tmp_path), chunk_size=10, overlap_ratio=0)
+    collection = AsyncMock()
+    collection.get.return_value = {"ids": []}
+    stats = {"add": 0, "update": 0, "removed": 0, "skipped": 0}
+    active = 0
+    max_active = 0
+    counter_lock = threading.Lock()
+
+    def embed(documents):
+        nonlocal active, max_active
+        with counter_lock:
+            active += 1
+            max_active = max(max_active, active)
+        threading.Event().wait(0.01)
+        with counter_lock:
+            active -= 1
+        return [[0.0] for _ in documents]
+
+    files = []
+    for idx in range(4):
+        file_path = tmp_path / f"file_{idx}.py"
+        file_path.write_text("0123456789")
+        files.append(str(file_path))
+
+    collection_lock, stats_lock, embedding_lock = Lock(), Lock(), Lock()
+    semaphore = asyncio.Semaphore(4)
+    with patch(
+        "vectorcode.subcommands.vectorise.get_embedding_function", return_value=embed
+    ):
+        await asyncio.gather(
+            *(
+                chunked_add(
+                    file,
+                    collection,
+                    collection_lock,
+                    stats,
+                    stats_lock,
+                    configs,
+                    100,
+                    semaphore,
+                    embedding_lock,
+                )
+                for file in files
+            )
+        )
+
+    assert max_active == 1
+    assert stats["add"] == 4
+
+
+@pytest.mark.asyncio(loop_scope="session")
+async def test_delete_paths_batches():
+    collection = AsyncMock()
+    paths = [f"/project/file_{idx}.py" for idx in range(1001)]
+
+    await delete_paths(collection, paths)
+
+    assert collection.delete.call_count == 3
+    assert [
+        call.kwargs["where"]["path"]["$in"] for call in collection.delete.call_args_list
+    ] == [paths[:500], paths[500:1000], paths[1000:]]